@@ -56,12 +56,26 @@ class CacheDB:
 
     def execute(self, sql: str, params=None) -> duckdb.DuckDBPyConnection:
         sql.rstrip("; \n")
-        self.log.debug(
-            f"{cleandoc(sql)};\n"
-            + "".join(f"  p{i + 1}: {p!r}\n" for i, p in enumerate(params or ()))
-        )
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug(
+                f"{cleandoc(sql)};\n"
+                + "".join(f"  p{i + 1}: {p!r}\n" for i, p in enumerate(params or ()))
+            )
         return self.conn.execute(sql, params)
 
+    def existing_tables(self, names: set[str]) -> set[str]:
+        """
+        Returns the subset of table `names` which exist in the database
+        """
+        sql = """
+          SELECT table_name
+          FROM information_schema.tables
+          WHERE table_catalog = current_database()
+            AND table_schema = current_schema()
+            AND list_contains(?, table_name)
+        """
+        return {x[0] for x in self.execute(sql, (list(names),)).fetchall()}
+
     @abstractmethod
     def create_db_tables(self):
         """
@@ -1,9 +1,9 @@
-import datetime
 import pathlib
+import time
 
 import click
 
-TODAY = datetime.date.today().isoformat()  # noqa: DTZ011
+TODAY = time.strftime("%Y-%m-%d")
 
 tolqc_alias = click.option(
     "--tolqc-alias",
@@ -99,7 +99,8 @@ pretty = click.option(
 
 
 def default_diff_mlwh_duckdb():
-    return pathlib.Path(f"diff_mlwh_{TODAY}.duckdb")
+    today = time.strftime("%Y-%m-%d")
+    return pathlib.Path(f"diff_mlwh_{today}.duckdb")
 
 
 diff_mlwh_duckdb = click.option(
@@ -108,9 +109,9 @@ diff_mlwh_duckdb = click.option(
     type=click.Path(path_type=pathlib.Path),
     help="""Name of duckdb database file which caches MLWH mismatches.
       Taken from the DIFF_MLWH_DUCKDB environment variable if set""",
-    default=default_diff_mlwh_duckdb(),
+    default=default_diff_mlwh_duckdb,
     envvar="DIFF_MLWH_DUCKDB",
-    show_default=True,
+    show_default="diff_mlwh_<TODAY>.duckdb",
 )
 
 table = click.option(
@@ -2,6 +2,9 @@ import csv
 import json
 import pathlib
 import re
+import sys
+from collections import Counter
+from operator import itemgetter
 
 import click
 
@@ -12,6 +15,21 @@ FILE_TYPE = click.Path(
     path_type=pathlib.Path,
 )
 DEFAULT_FILENAMES = "data/pacbio_tolqc_data.json", "data/pacbio_run_report.json"
+TAG_DIGITS = re.compile(r"(\d+)")
+
+# Columns with few distinct values, whose strings are interned so that
+# rows share a single copy of each value
+INTERN_COLUMNS = frozenset(
+    (
+        "platform",
+        "model",
+        "instrument",
+        "binding_kit",
+        "sequencing_kit",
+        "pipeline",
+        "species",
+    )
+)
 
 
 @click.command(
@@ -28,11 +46,10 @@ DEFAULT_FILENAMES = "data/pacbio_tolqc_data.json", "data/pacbio_run_report.json"
     show_default=True,
 )
 @click.option(
-    "--diff-fields",
-    is_flag=True,
-    default=False,
+    "--diff-fields/--all-fields",
+    default=True,
     show_default=True,
-    help="Only show fields in each record which differ",
+    help="Only show fields in each record which differ, or show all fields",
 )
 @click.option(
     "--key-counts",
@@ -103,36 +120,27 @@ def main(json_input, rprt_input, diff_fields):
     json_dict = merge_by_idx(json_row_data)
     rprt_dict = merge_by_idx(rprt_row_data)
 
-    idx_count = {}
-    count_keys(idx_count, json_dict)
-    count_keys(idx_count, rprt_dict)
-    for idx in idx_count:
-        json_dat = json_dict.get(idx)
-        rprt_dat = rprt_dict.get(idx)
-        if json_dat and rprt_dat:
-            if diffs := diff(json_dat, rprt_dat):
-                if diff_fields:
-                    print(f"Diff for index '{idx}':\n" + format_rows(*diffs))
-                else:
-                    print(
-                        f"Diff for index '{idx}':\n" + format_rows(json_dat, rprt_dat)
-                    )
-        elif json_dat:
-            print("Only in data.json:\n" + format_rows(json_dat))
-        else:
-            print("Only in PacBio run report:\n" + format_rows(rprt_dat))
+    json_keys = json_dict.keys()
+    rprt_keys = rprt_dict.keys()
+    for idx in sorted(json_keys & rprt_keys):
+        json_dat = json_dict[idx]
+        rprt_dat = rprt_dict[idx]
+        if diffs := diff(json_dat, rprt_dat, headers):
+            if diff_fields:
+                print(f"Diff for index '{idx}':\n" + format_rows(*diffs))
+            else:
+                print(f"Diff for index '{idx}':\n" + format_rows(json_dat, rprt_dat))
+    for idx in sorted(json_keys - rprt_keys):
+        print("Only in data.json:\n" + format_rows(json_dict[idx]))
+    for idx in sorted(rprt_keys - json_keys):
+        print("Only in PacBio run report:\n" + format_rows(rprt_dict[idx]))
 
 
 def show_key_count(file):
-    data = json.loads(file.read_text())
-    counts = {}
-    max_count = 0
-    for row in data:
-        for k, v in row.items():
-            if v is not None and v != "":
-                c = counts[k] = 1 + counts.get(k, 0)
-                if c > max_count:
-                    max_count = c
+    counts = Counter()
+    for row in json_rows(file):
+        counts.update(k for k, v in row.items() if v is not None and v != "")
+    max_count = max(counts.values(), default=0)
 
     def hoist_acgt(item):
         k = item[0]
@@ -147,33 +155,37 @@ def show_key_count(file):
             click.echo(f"{v:7d}  {k}")
 
 
-def count_keys(count_dict, dctnry):
-    for k, v in dctnry.items():
-        if v is not None and v != "":
-            count_dict[k] = 1 + count_dict.get(k, 0)
-
-    return count_dict
-
-
 def process_file(headers, alt_column_names, file, source):
-    data = json.loads(file.read_text())
-
+    plan = column_plan(headers, alt_column_names)
     row_data = []
-    for row in data:
-        row_data.append(process_row(headers, alt_column_names, source, row))
+    for row in json_rows(file):
+        row_data.append(process_row(plan, source, row))
 
     csv_file = store_csv(file, headers, row_data)
 
     return row_data, csv_file
 
 
+def json_rows(file):
+    """
+    Iterates over the records in a JSON array file, or streams them one line
+    at a time from an ND-JSON file.
+    """
+    with file.open("rb") as fh:
+        if file.suffix == ".ndjson":
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(fh)
+
+
 def store_csv(file, headers, data):
     csv_file = file.with_suffix(".csv")
     with csv_file.open(mode="w") as f:
         writer = csv.writer(f)
         writer.writerow(headers)
-        for row in data:
-            writer.writerow(row[k] for k in headers)
+        writer.writerows(map(itemgetter(*headers), data))
     return csv_file
 
 
@@ -182,11 +194,18 @@ def merge_by_idx(row_data):
     for dat in row_data:
         idx = dat["idx"]
         if other_dat := idx_dat.get(idx):
-            if dat["specimen"] in other_dat["specimen"]:
-                idx_dat[idx] = dat
-            elif other_dat["specimen"] in dat["specimen"]:
-                pass
+            # Keep the row with the shorter specimen name if it is contained
+            # in the other.  Containment is only possible for the shorter of
+            # the two, so only one substring search is needed.
+            new_spec = dat["specimen"]
+            other_spec = other_dat["specimen"]
+            if len(new_spec) <= len(other_spec):
+                contained = new_spec in other_spec
+                if contained:
+                    idx_dat[idx] = dat
             else:
+                contained = other_spec in new_spec
+            if not contained:
                 msg = f"More than one row with index '{idx}':\n" + format_rows(
                     # *diff(dat, other_dat)
                     dat,
@@ -203,31 +222,44 @@ def merge_by_idx(row_data):
 def format_rows(*rows):
     header = tuple(rows[0].keys())
     max_hdr = max(len(col) for col in header)
-    max_row = []  # Max length of any value in each row
-    for r in rows:
-        max_v = max(len(str(val)) for val in r.values())
-        max_row.append(max_v)
-    s = ""
+
+    # Stringify each value once, then find the max length of any value in
+    # each row.  None is shown as an empty cell, but counts as the width of
+    # "None" when sizing the row.
+    str_rows = [{k: "" if v is None else str(v) for k, v in r.items()} for r in rows]
+    max_row = [
+        max(
+            len("None") if v is None else len(sv)
+            for v, sv in zip(r.values(), sr.values(), strict=True)
+        )
+        for r, sr in zip(rows, str_rows, strict=True)
+    ]
+
+    lines = []
     for col in header:
-        s += f"  {col:>{max_hdr}}"
-        for i, row in enumerate(rows):
-            val = row[col]
-            val = "" if val is None else str(val)
-            s += f"  {val:{max_row[i]}}"
-        s += "\n"
+        parts = [f"  {col:>{max_hdr}}"]
+        for sr, width in zip(str_rows, max_row, strict=True):
+            parts.append(f"  {sr[col]:{width}}")
+        parts.append("\n")
+        lines.append("".join(parts))
 
-    return s
+    return "".join(lines)
 
 
-def diff(a, b):
+def diff(a, b, keys=None):
     """
     Diff two dicts, returning two dicts of the differing values,
     or None if they are the same.
     Assumes that the values are not nested data structures.
+    Only the `keys` given are compared if supplied, otherwise the union of
+    the keys of both dicts.
     """
+    if keys is None:
+        keys = a.keys() | b.keys()
+
     a_diff = {}
     b_diff = {}
-    for k in a | b:
+    for k in keys:
         va = a.get(k)
         vb = b.get(k)
         if va != vb:
@@ -240,15 +272,28 @@ def diff(a, b):
         return None
 
 
-def process_row(headers, alt_column_names, source, row):
+def column_plan(headers, alt_column_names):
+    """
+    Builds a tuple for each of the `headers` of the column name, its
+    alternative column name in the input rows (or None if it has no
+    alternative) and whether its string values should be interned.
+    """
+    return [(col, alt_column_names.get(col), col in INTERN_COLUMNS) for col in headers]
+
+
+def process_row(plan, source, row):
+    # Keys are added in the order of the headers
     dat = {}
-    for col in headers:
+    for col, alt, intern in plan:
         if col == "source":
-            dat[col] = source
-        elif alt := alt_column_names.get(col):
-            dat[col] = row.get(col, row.get(alt))
+            val = source
+        elif alt is None:
+            val = row.get(col)
         else:
-            dat[col] = row.get(col)
+            val = row.get(col, row.get(alt))
+        if intern and isinstance(val, str):
+            val = sys.intern(val)
+        dat[col] = val
 
     dat["idx"] = make_index(dat)
 
@@ -263,7 +308,7 @@ def make_index(row):
     if ti := row.get("tag_index"):
         idx += f"#{ti}"
     elif tag := row.get("tag"):
-        if m := re.search(r"(\d+)", tag):
+        if m := TAG_DIGITS.search(tag):
             idx += f"#{m.group(1)}"
         else:
             msg = f"Cannot parse index from tag {tag} in:\n" + format_rows(row)
@@ -273,11 +318,9 @@ def make_index(row):
 
 
 def json_file_key_counts(file):
-    data = json.loads(pathlib.Path(file).read_text())
-    stats = {}
-    for row in data:
-        for key in row:
-            stats[key] = 1 + stats.get(key, 0)
+    stats = Counter()
+    for row in json_rows(pathlib.Path(file)):
+        stats.update(row.keys())
     return json.dumps(stats, sort_keys=True, indent=2)
 
 
@@ -51,7 +51,7 @@ def cli(tolqc_alias, tolqc_url, api_token, data_id_list, set_processed):
             sys.exit(f"Error: Failed to fetch data records named: {sorted(missed)}")
 
         if set_processed is not None:
-            set_data_processed(ads, fetched_data, set_processed)
+            set_data_processed(client, fetched_data, set_processed)
         for name in data_id_list:
             data = fetched_data[name]
             print_data_row(data)
@@ -59,25 +59,33 @@ def cli(tolqc_alias, tolqc_url, api_token, data_id_list, set_processed):
         list_unproccessed_data(ads)
 
 
-def set_data_processed(ads, fetched_data, set_processed):
+def set_data_processed(client, fetched_data, set_processed):
+    ads = client.ads
     set_val = None if set_processed == "null" else int(set_processed)
     Obj = ads.data_object_factory  # noqa: N806
-    updates = [
-        Obj("data", id_=x.id, attributes={"processed": set_val})
-        for x in fetched_data.values()
-    ]
-    ads.upsert("data", updates)
-    for x in fetched_data.values():
-        x.processed = set_val
+    for page in client.pages(list(fetched_data.values())):
+        ads.upsert(
+            "data",
+            [Obj("data", id_=x.id, attributes={"processed": set_val}) for x in page],
+        )
+        for x in page:
+            x.processed = set_val
 
 
 def print_data_row(data):
+    sys.stdout.write(format_data_row(data))
+
+
+def format_data_row(data):
     flag = "null" if (x := data.processed) is None else x
     date_str = d.isoformat() if (d := data.date) else ""
-    print(f"{flag:<4}  {date_str:25}  {data.id}")
+    return f"{flag:<4}  {date_str:25}  {data.id}\n"
 
 
 def list_unproccessed_data(ads):
     filt = DataSourceFilter(exact={"processed": 0})
-    for data in ads.get_list("data", object_filters=filt):
-        print_data_row(data)
+    sys.stdout.write(
+        "".join(
+            format_data_row(data) for data in ads.get_list("data", object_filters=filt)
+        )
+    )
@@ -1,22 +1,21 @@
 import json
 import urllib.parse
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import mysql.connector
-import psycopg2
-from mysql.connector.abstracts import MySQLConnectionAbstract
-from psycopg2.extras import DictCursor
+if TYPE_CHECKING:
+    from mysql.connector.abstracts import MySQLConnectionAbstract
 
 
 class ConnectionParamsError(Exception):
     """Error in the ~/.connection_params.json config file"""
 
 
-def mlwh_db() -> MySQLConnectionAbstract:
+def mlwh_db() -> "MySQLConnectionAbstract":
     return make_connection("mlwh")
 
 
-def mlwh_rw_db() -> MySQLConnectionAbstract:
+def mlwh_rw_db() -> "MySQLConnectionAbstract":
     return make_connection("mlwh-rw")
 
 
@@ -27,9 +26,17 @@ def sts_db():
 def make_connection(db_alias):
     params = get_connection_params_entry(db_alias)
     dbd = params.pop("dbd")
+
+    # Database drivers are imported when needed, since they are slow to load
+    # and most scripts which import this module only use one of them.
     if dbd == "mysql":
+        import mysql.connector
+
         return mysql.connector.connect(**params)
     elif dbd == "Pg":
+        import psycopg2
+        from psycopg2.extras import DictCursor
+
         return psycopg2.connect(cursor_factory=DictCursor, **params)
     else:
         msg = f"Unknown database type '{dbd}'"
@@ -55,6 +62,16 @@ def get_connection_url(db_alias):
     )
 
 
+# Parsed contents of connection params files, keyed by file path, along with
+# the modification time of the file when it was read.
+_params_cache: dict[Path, tuple[int, dict]] = {}
+
+
+def reset_params_cache():
+    """Forget any cached contents of ~/.connection_params.json"""
+    _params_cache.clear()
+
+
 def get_connection_params_entry(alias, no_params_file_ok=False):
     params_name = ".connection_params.json"
     params_file = Path().home() / params_name
@@ -63,23 +80,33 @@ def get_connection_params_entry(alias, no_params_file_ok=False):
         return None
 
     try:
-        mode = params_file.stat().st_mode & 0o777
+        stat = params_file.stat()
     except FileNotFoundError:
         msg = f"Missing ~/{params_name} file"
         raise ConnectionParamsError(msg) from None
 
     # Check permissions are 0600
+    mode = stat.st_mode & 0o777
     if mode != 0o600:
         msg = f"~/{params_name} must be mode 0600 but is mode 0{mode:o}"
         raise ConnectionParamsError(msg)
 
-    try:
-        if db_params := json.loads(params_file.read_text()).get(alias):
-            return db_params
-        else:
-            msg = f"Alias '{alias}' not found in ~/{params_name} file"
-            raise ConnectionParamsError(msg)
-    except json.decoder.JSONDecodeError as jde:
-        detail = "\n".join(jde.args)
-        msg = f"Syntax error in ~/{params_name} - {detail}"
-        raise ConnectionParamsError(msg) from None
+    # Only re-parse the file if it has been modified since it was cached
+    cached = _params_cache.get(params_file)
+    if cached and cached[0] == stat.st_mtime_ns:
+        all_params = cached[1]
+    else:
+        try:
+            all_params = json.loads(params_file.read_text())
+        except json.decoder.JSONDecodeError as jde:
+            detail = "\n".join(jde.args)
+            msg = f"Syntax error in ~/{params_name} - {detail}"
+            raise ConnectionParamsError(msg) from None
+        _params_cache[params_file] = stat.st_mtime_ns, all_params
+
+    if db_params := all_params.get(alias):
+        # Return a copy, since callers such as `make_connection()` modify it
+        return dict(db_params)
+    else:
+        msg = f"Alias '{alias}' not found in ~/{params_name} file"
+        raise ConnectionParamsError(msg)
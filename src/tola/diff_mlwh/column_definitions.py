@@ -1,6 +1,7 @@
 from functools import cache
 
 
+@cache
 def table_map():
     """
     Built using the script `scripts/make_table_map.py`
@@ -90,8 +91,6 @@ def table_map():
         },
     }
 
-    return table_map
-
 
 @cache
 def get_table_patcher(table):
@@ -121,8 +120,8 @@ def get_table_patcher(table):
                     for key, out_key in patch_map.items():
                         patch[out_key] = mlwh[key]
                 else:
-                    for key, out_key in patch_map.items():
-                        if tolqc[key] != mlwh[key]:
+                    for key in mm.differing_columns:
+                        if out_key := patch_map.get(key):
                             patch[out_key] = mlwh[key]
                 if patch or new_flag:
                     patch = {table + ".id": pk, **patch}
@@ -246,6 +245,7 @@ COL_DEFS = {
 }
 
 
+@cache
 def table_cols():
     return "\n, ".join(
         f"{n} {t} PRIMARY KEY" if n == "data_id" else f"{n} {t}"
@@ -253,5 +253,19 @@ def table_cols():
     )
 
 
+@cache
 def json_cols():
     return "\n, ".join(f"{n}: '{t}'" for n, t in COL_DEFS.items())
+
+
+@cache
+def differing_columns_sql(left, right):
+    """
+    Builds a SQL expression which evaluates to the list of names of the
+    columns where the values in the `left` and `right` tables differ.
+    """
+    cases = "\n    , ".join(
+        f"CASE WHEN {left}.{n} IS DISTINCT FROM {right}.{n} THEN '{n}' END"
+        for n in COL_DEFS
+    )
+    return f"list_filter([\n    {cases}\n  ], lambda x: x IS NOT NULL)"
@@ -1,15 +1,47 @@
 import inspect
 import logging
-from tempfile import NamedTemporaryFile
 
 import click
 
 from tola.cache_db import CacheDB
-from tola.diff_mlwh.column_definitions import json_cols, table_cols
-from tola.diff_mlwh.diff_store import DiffStore, Mismatch
+from tola.diff_mlwh.column_definitions import (
+    differing_columns_sql,
+    json_cols,
+    table_cols,
+)
+from tola.diff_mlwh.diff_store import Mismatch
 
 log = logging.getLogger(__name__)
 
+# Query used by `MLWHDiffDB.fetch_stored_diffs()`, which fills in the filter
+# on the `diff_store` table, and appends any WHERE and ORDER BY clauses.
+# Filtering `diff_store` first means that only the selected rows are joined to
+# the `mlwh` and `tolqc` tables.
+STORED_DIFFS_SQL = inspect.cleandoc("""
+  WITH drl AS (
+      SELECT data_id
+        , array_agg(reason ORDER BY reason) AS reasons
+      FROM diff_reason
+      GROUP BY data_id
+  )
+  , ds AS (
+      SELECT *
+      FROM diff_store AS ds
+      {}
+  )
+  SELECT ds.data_id
+    , mlwh
+    , tolqc
+    , ds.mlwh_hash
+    , ds.tolqc_hash
+    , ds.differing_columns
+    , drl.reasons
+  FROM ds
+  JOIN mlwh USING (data_id)
+  JOIN tolqc USING (data_id)
+  LEFT JOIN drl USING (data_id)
+""")
+
 
 class MLWHDiffDB(CacheDB):
     """
@@ -17,8 +49,9 @@ class MLWHDiffDB(CacheDB):
     identified by their `data_id` key can be labelled with reasons.
     """
 
-    def update(self, tqc, mlwh_ndjson):
-        self.load_new_data(tqc, mlwh_ndjson)
+    def update(self, tqc, mlwh_ndjson, tolqc_ndjson=None):
+        self.load_tolqc_data(tqc, tolqc_ndjson)
+        self.load_mlwh_data(mlwh_ndjson)
         self.find_diffs()
 
     def store_reasons(self, reason, data_id_list):
@@ -47,10 +80,14 @@ class MLWHDiffDB(CacheDB):
         return 0 if row_count is None else row_count[0]
 
     def create_db_tables(self):
-        tables = {x[0] for x in self.execute("SHOW TABLES").fetchall()}
+        tables = self.existing_tables(
+            {"diff_store", "update_log", "diff_reason", "tolqc", "mlwh"}
+        )
 
         if "diff_store" not in tables:
             self.create_diff_store()
+        elif self.diff_store_hash_type() == "UBIGINT":
+            self.convert_diff_store_to_md5_hashes()
 
         if "update_log" not in tables:
             self.execute("CREATE TABLE update_log(updated_at TIMESTAMPTZ)")
@@ -65,34 +102,25 @@ class MLWHDiffDB(CacheDB):
 
         self.create_or_update_macros_and_views()
 
-    def load_new_data(self, tqc, mlwh_ndjson):
-        # Fetch the current MLWH data from ToLQC
-        tolqc_tmp = NamedTemporaryFile("r", prefix="tolqc_", suffix=".ndjson")  # noqa: SIM115
-        log.info(
-            f"Downloading current data from {tqc.tolqc_alias} into {tolqc_tmp.name}"
-        )
-        tqc.download_file("report/mlwh-data?format=NDJSON", tolqc_tmp.name)
+    def load_tolqc_data(self, tqc, tolqc_ndjson=None):
+        """
+        Load the `tolqc` table from `tolqc_ndjson` if given, otherwise DuckDB
+        streams the current MLWH data straight from the ToLQC report URL.
+        """
+        if tolqc_ndjson is None:
+            tolqc_ndjson = tqc.report_url("mlwh-data", params={"format": "NDJSON"})
+        self.load_table_from_json("tolqc", tolqc_ndjson)
 
-        self.load_table_from_json("tolqc", tolqc_tmp.name)
+    def load_mlwh_data(self, mlwh_ndjson):
         self.load_table_from_json("mlwh", str(mlwh_ndjson))
 
     def find_diffs(self):
         self.execute("INSERT INTO update_log(updated_at) VALUES (current_timestamp)")
-        ds = DiffStore()
-        for m in self.compare_tables():
-            ds.add(m)
-        self.store_diffs(ds)
-
-    def store_diffs(self, ds):
-        count = len(ds.data_id)
+        count = self.store_new_diffs()
         if count == 0:
             log.info("No new differences found")
-            return
-        log.info(f"Found {count} new differences")
-        arrow_table = ds.arrow_table()  # noqa: F841
-        sql = "INSERT INTO diff_store SELECT *, current_timestamp FROM arrow_table"
-        log.debug(sql)
-        self.conn.execute(sql)
+        else:
+            log.info(f"Found {count} new differences")
 
     def create_data_table(self, name):
         self.execute(f"CREATE OR REPLACE TABLE {name}({table_cols()})")
@@ -103,11 +131,28 @@ class MLWHDiffDB(CacheDB):
 
         # NDJSON from MLWH has different number of columns for Illumina and PacBio
         # data.  To create the same table structure for the `mlwh` and `tolqc`
-        # tables we provide the column mapping.
-        self.execute(
-            f"INSERT INTO {name} FROM read_json(?, columns = {{{json_cols()}}})",
-            (file,),
-        )
+        # tables we provide the column mapping.  Both files are always ND-JSON,
+        # so format detection is skipped, which also lets DuckDB parse the
+        # file in parallel.
+        sql = f"""
+          INSERT INTO {name}
+          FROM read_json(
+            ?,
+            format = 'newline_delimited',
+            columns = {{{json_cols()}}}
+          )
+        """  # noqa: S608
+
+        # The order of rows in the `mlwh` and `tolqc` tables doesn't matter.
+        # They are only joined on `data_id`, and `fetch_stored_diffs()` sorts
+        # its results.  So DuckDB can load the file in parallel without
+        # putting the rows back into file order.  The setting applies to the
+        # whole connection, so it is reset once the table is loaded.
+        self.execute("SET preserve_insertion_order = false")
+        try:
+            self.execute(sql, (file,))
+        finally:
+            self.execute("RESET preserve_insertion_order")
 
     def fetch_stored_diffs(
         self,
@@ -117,18 +162,24 @@ class MLWHDiffDB(CacheDB):
         reason=None,
         data_id_list=None,
     ):
-        args = []
-        where = []
+        ds_args = []
+        ds_where = []
         if since:
-            where.append("ds.found_at >= ?")
-            args.append(since)
+            ds_where.append("ds.found_at >= ?")
+            ds_args.append(since)
         elif show_new_diffs:
-            where.append("ds.found_at >= (SELECT MAX(updated_at) FROM update_log)")
+            ds_where.append("ds.found_at >= (SELECT MAX(updated_at) FROM update_log)")
 
         if column_class:
-            where.append("ds.differing_columns = ?")
-            args.append(column_class)
+            ds_where.append("ds.differing_columns = ?")
+            ds_args.append(column_class)
 
+        if data_id_list:
+            ds_where.append("list_contains(?, ds.data_id)")
+            ds_args.append(data_id_list)
+
+        args = []
+        where = []
         if reason:
             if reason.upper() == "NONE":
                 where.append("drl.reasons IS NULL")
@@ -136,35 +187,18 @@ class MLWHDiffDB(CacheDB):
                 where.append("list_contains(drl.reasons, ?)")
                 args.append(reason)
 
-        if data_id_list:
-            where.append("list_contains(?, ds.data_id)")
-            args.append(data_id_list)
-
-        sql = inspect.cleandoc("""
-          WITH drl AS (
-              SELECT data_id
-                , array_agg(reason ORDER BY reason) AS reasons
-              FROM diff_reason
-              GROUP BY data_id
-          )
-          SELECT ds.data_id
-            , mlwh
-            , tolqc
-            , ds.mlwh_hash
-            , ds.tolqc_hash
-            , ds.differing_columns
-            , drl.reasons
-          FROM diff_store ds
-          JOIN mlwh USING (data_id)
-          JOIN tolqc USING (data_id)
-          LEFT JOIN drl USING (data_id)
-        """)
+        sql = STORED_DIFFS_SQL.format(
+            "WHERE " + "\n        AND ".join(ds_where) if ds_where else ""
+        )
 
         if where:
             sql += "\nWHERE " + "\n  AND ".join(where)
 
         sql += "\nORDER BY ds.data_id"
 
+        # Parameters in the `ds` CTE come before those in the WHERE clause
+        args = ds_args + args
+
         crsr = self.execute(sql, args)
 
         return [Mismatch(*diff) for diff in crsr.fetchall()]
@@ -177,80 +211,62 @@ class MLWHDiffDB(CacheDB):
           GROUP BY differing_columns
           ORDER BY differing_columns
         """
-        crsr = self.execute(sql)
-        while c := crsr.fetchone():
-            n, cols = c
+        for n, cols in self.execute(sql).fetchall():
             click.echo(f"{n:>7}  {','.join(cols)}")
 
-    def compare_tables(self):
+    def store_new_diffs(self):
         """
-        Creates two tables from the two tables `mlwh` and `tolqc`. The tables
-        contain the `data_id`, an MD5 hash of the entire row cast to VARCHAR, and
-        the row itself as a DuckDB STRUCT.
-
-        The join returns any rows where the `data_id` matches but the MD5 hash
-        does not.
+        Joins the `mlwh` and `tolqc` tables on `data_id`, and finds any rows
+        where a hash of the entire row differs, along with the list of names
+        of the columns which differ. These are inserted into the `diff_store`
+        table.
 
-        ANTI JOINs to the `diff_store` table ignore any mismatches which have
-        already been seen.
-        """
+        Stale rows are first removed from `diff_store`, so the ANTI JOIN to
+        it ignores only mismatches which have already been seen.
 
-        self.execute("SET temp_directory = '/tmp'")
-        for name in ("mlwh", "tolqc"):
-            self.build_h_table(name)
-            self.cleanup_diff_store(name)
+        DuckDB's `hash()` is fast, but its values may change between DuckDB
+        releases, so it is only used to compare the rows within the query.
+        The hashes kept in `diff_store` are MD5s, which are only computed for
+        new differences and for the rows already in `diff_store`.
 
-        sql = """
-          SELECT mlwh_h.data_id
-            , mlwh AS mlwh_struct
-            , tolqc AS tolqc_struct
-            , mlwh_h.hash AS mlwh_hash
-            , tolqc_h.hash AS tolqc_hash
-          FROM mlwh_h JOIN tolqc_h
-            ON mlwh_h.data_id = tolqc_h.data_id
-            AND mlwh_h.hash != tolqc_h.hash
-          JOIN mlwh
-            ON mlwh_h.data_id = mlwh.data_id
-          JOIN tolqc
-            ON tolqc_h.data_id = tolqc.data_id
-          ANTI JOIN diff_store AS mds
-            ON mlwh_h.hash = mds.mlwh_hash
-          ANTI JOIN diff_store AS qds
-            ON tolqc_h.hash = qds.tolqc_hash
-          ORDER BY mlwh_h.data_id
+        Returns the number of new differences stored.
         """
-        crsr = self.execute(sql)
 
-        while row := crsr.fetchone():
-            yield Mismatch(*row)
+        self.execute("SET temp_directory = '/tmp'")
+        self.cleanup_diff_store()
 
-    def build_h_table(self, name):
-        """
-        Create tempoary table with a hash of each row in table `name`
-        """
         sql = f"""
-          CREATE TEMPORARY TABLE {name}_h AS
-            SELECT data_id
-              , md5({name}::VARCHAR) AS hash
-            FROM {name}
+          INSERT INTO diff_store
+          SELECT data_id
+            , md5(mlwh::VARCHAR) AS mlwh_hash
+            , md5(tolqc::VARCHAR) AS tolqc_hash
+            , {differing_columns_sql("mlwh", "tolqc")} AS differing_columns
+            , current_timestamp AS found_at
+          FROM mlwh JOIN tolqc USING (data_id)
+          ANTI JOIN diff_store USING (data_id)
+          WHERE hash(mlwh) != hash(tolqc)
         """  # noqa: S608
-        self.execute(sql)
+        (count,) = self.execute(sql).fetchone()
 
-    def cleanup_diff_store(self, name):
+        return count
+
+    def cleanup_diff_store(self):
         """
-        Remove any rows in `diff_store` which no longer match the current row in
-        the hash table
+        Remove any rows in `diff_store` where either of the current rows in
+        the `mlwh` and `tolqc` tables are missing or no longer match the
+        stored hashes. Only rows with a `data_id` in `diff_store` are hashed.
         """
 
-        sql = f"""
-          DELETE FROM diff_store
-          WHERE data_id IN (
-            SELECT data_id
-            FROM diff_store
-            ANTI JOIN {name}_h AS h
-              ON diff_store.{name}_hash = h.hash
+        sql = """
+          DELETE FROM diff_store AS ds
+          WHERE NOT EXISTS (
+            SELECT 1
+            FROM mlwh JOIN tolqc USING (data_id)
+            WHERE data_id = ds.data_id
+              AND md5(mlwh::VARCHAR) = ds.mlwh_hash
+              AND md5(tolqc::VARCHAR) = ds.tolqc_hash
           )
-        """  # noqa: S608
+        """
         self.execute(sql)
 
     def create_diff_store(self):
@@ -265,6 +281,49 @@ class MLWHDiffDB(CacheDB):
         """
         self.execute(sql)
 
+    def diff_store_hash_type(self):
+        sql = """
+          SELECT data_type
+          FROM information_schema.columns
+          WHERE table_catalog = current_database()
+            AND table_schema = current_schema()
+            AND table_name = 'diff_store'
+            AND column_name = 'mlwh_hash'
+        """
+        (hash_type,) = self.execute(sql).fetchone()
+        return hash_type
+
+    def convert_diff_store_to_md5_hashes(self):
+        """
+        Converts a `diff_store` table which holds DuckDB `hash()` values of the
+        `mlwh` and `tolqc` rows back to MD5 hashes. Stored diffs whose hashes
+        still match the current rows keep their `found_at` time. Any others
+        are dropped, and will be found again by the next update.
+        """
+        log.info("Converting diff_store DuckDB hash() values to MD5 hashes")
+        self.conn.begin()
+        try:
+            self.execute("ALTER TABLE diff_store RENAME TO diff_store_hash")
+            self.create_diff_store()
+            self.execute("""
+              INSERT INTO diff_store
+              SELECT ds.data_id
+                , md5(mlwh::VARCHAR)
+                , md5(tolqc::VARCHAR)
+                , ds.differing_columns
+                , ds.found_at
+              FROM diff_store_hash AS ds
+              JOIN mlwh USING (data_id)
+              JOIN tolqc USING (data_id)
+              WHERE ds.mlwh_hash = hash(mlwh)
+                AND ds.tolqc_hash = hash(tolqc)
+            """)
+            self.execute("DROP TABLE diff_store_hash")
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
     def create_diff_reason_table(self):
         self.execute("""
           CREATE TABLE diff_reason(
@@ -1,6 +1,7 @@
 import logging
 import pathlib
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import NamedTemporaryFile
 
 import click
@@ -14,6 +15,8 @@ from tola.ndjson import ndjson_row
 from tola.pretty import bold, s
 from tola.tqc.upsert import TableUpserter
 
+log = logging.getLogger(__name__)
+
 
 @click.command
 @click_options.tolqc_alias
@@ -262,19 +265,30 @@ def cli(
         if output_format == "PRETTY":
             write_pretty_output(diffs, show_columns, sys.stdout)
         else:
-            for m in diffs:
-                sys.stdout.write(ndjson_row(m.differences_dict(show_columns)))
+            sys.stdout.writelines(
+                ndjson_row(m.differences_dict(show_columns)) for m in diffs
+            )
 
 
 def update_diff_database(tqc, diff_db, mlwh_ndjson=None):
-    if mlwh_ndjson and mlwh_ndjson.exists():
-        log.info(f"Loading MLWH data from {mlwh_ndjson}")
-    else:
-        mlwh_tmp = NamedTemporaryFile("r", prefix="mlwh_", suffix=".ndjson")  # noqa: SIM115
-        log.info(f"Downloading data from MLWH into {mlwh_tmp.name}")
-        mlwh_ndjson = pathlib.Path(mlwh_tmp.name)
-        fetch_mlwh_seq_data_to_file(tqc, mlwh_ndjson)
-    diff_db.update(tqc, mlwh_ndjson)
+    # Load the ToLQC data in a second thread while the MLWH data is fetched,
+    # since both are mostly waiting on the network.  The DuckDB connection is
+    # not used by this thread until the load has finished.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        tolqc_future = executor.submit(diff_db.load_tolqc_data, tqc)
+
+        if mlwh_ndjson and mlwh_ndjson.exists():
+            log.info(f"Loading MLWH data from {mlwh_ndjson}")
+        else:
+            mlwh_tmp = NamedTemporaryFile("r", prefix="mlwh_", suffix=".ndjson")  # noqa: SIM115
+            log.info(f"Downloading data from MLWH into {mlwh_tmp.name}")
+            mlwh_ndjson = pathlib.Path(mlwh_tmp.name)
+            fetch_mlwh_seq_data_to_file(tqc, mlwh_ndjson)
+
+        tolqc_future.result()
+
+    diff_db.load_mlwh_data(mlwh_ndjson)
+    diff_db.find_diffs()
 
 
 def update_tolqc(tqc, diffs, tables_to_patch, apply_flag):
@@ -4,7 +4,6 @@ import sys
 from typing import Any
 
 import click
-import pyarrow
 
 from tola.pretty import bg_green, bg_red, bold, field_style
 from tola.terminal import colour_pager
@@ -30,7 +29,7 @@ class Mismatch:
         tolqc: dict[str, Any],
         mlwh_hash: str,
         tolqc_hash: str,
-        differing_columns: list[str] = None,
+        differing_columns: list[str],
         reasons: list[str] = None,
     ):
         self.data_id = data_id
@@ -38,11 +37,8 @@ class Mismatch:
         self.tolqc = tolqc
         self.mlwh_hash = mlwh_hash
         self.tolqc_hash = tolqc_hash
+        self.differing_columns = differing_columns
         self.reasons = reasons
-        if differing_columns:
-            self.differing_columns = differing_columns
-        else:
-            self._build_differing_columns()
 
     @property
     def diff_class(self) -> list[str]:
@@ -62,43 +58,6 @@ class Mismatch:
                 dd[col] = (self.mlwh[col], self.tolqc[col])
         return dd
 
-    def _build_differing_columns(self):
-        mlwh = self.mlwh
-        tolqc = self.tolqc
-
-        diff_cols = []
-        for fld in mlwh:
-            if mlwh[fld] != tolqc[fld]:
-                diff_cols.append(fld)
-        if not diff_cols:
-            msg = f"Failed to find any differing columns in:\n{mlwh = }\n{tolqc = }"
-            raise ValueError(msg)
-
-        self.differing_columns = diff_cols
-
-    def get_patch_for_table(self, table, col_map):
-        mlwh = self.mlwh
-        tolqc = self.tolqc
-
-        patch = {}
-        primary_key = None
-        for key, out_key in col_map.items():
-            if out_key == table + ".id":
-                primary_key = key
-                continue
-            mlwh_v = mlwh[key]
-            tolqc_v = tolqc[key]
-            if mlwh_v != tolqc_v:
-                patch[out_key] = mlwh_v
-        if not primary_key:
-            msg = f"Failed to find primary key in: {col_map}"
-            raise ValueError(msg)
-        if patch:
-            pk_out = col_map[primary_key]
-            patch[pk_out] = mlwh[primary_key]
-            return patch
-        return None
-
     def pretty(self, show_columns=None):
         fmt = io.StringIO()
         fmt.write(f"\n{bold(self.data_id)}")
@@ -187,32 +146,6 @@ class Mismatch:
             yield frst[i:end], scnd[i:end]
 
 
-class DiffStore:
-    """Accumulates diff results"""
-
-    def __init__(self):
-        self.data_id = []
-        self.mlwh_hash = []
-        self.tolqc_hash = []
-        self.differing_columns = []
-
-    def add(self, m: Mismatch):
-        self.data_id.append(m.data_id)
-        self.mlwh_hash.append(m.mlwh_hash)
-        self.tolqc_hash.append(m.tolqc_hash)
-        self.differing_columns.append(m.differing_columns)
-
-    def arrow_table(self):
-        return pyarrow.Table.from_pydict(
-            {
-                "data_id": pyarrow.array(self.data_id),
-                "mlwh_hash": pyarrow.array(self.mlwh_hash),
-                "tolqc_hash": pyarrow.array(self.tolqc_hash),
-                "differing_columns": pyarrow.array(self.differing_columns),
-            }
-        )
-
-
 def write_pretty_output(
     diffs: list[Mismatch], show_columns=None, filehandle=sys.stdout
 ):
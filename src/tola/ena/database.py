@@ -26,7 +26,9 @@ class EnaCache(CacheDB):
     def create_db_tables(self):
         self.add_macros()
 
-        tables = {x[0] for x in self.execute("SHOW TABLES").fetchall()}
+        tables = self.existing_tables(
+            {"reason_dict", "error_reason", "tolqc", "asm_data", "ena", "update_log"}
+        )
 
         if "reason_dict" not in tables:
             self.create_reason_dict_table()
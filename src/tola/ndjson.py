@@ -3,12 +3,11 @@ import json
 import os
 import sys
 from typing import Any
-
-import pytz
+from zoneinfo import ZoneInfo
 
 # Ideally the timezone could be collected from the source, such as the MLWH
 # MySQL server.
-DEFAULT_TZ = pytz.timezone(os.getenv("TZ", "Europe/London"))
+DEFAULT_TZ = ZoneInfo(os.getenv("TZ", "Europe/London"))
 
 
 class DateTimeZoneEncoder(json.JSONEncoder):
@@ -33,7 +32,7 @@ def set_timezone_if_naive(dt: datetime.datetime) -> datetime.datetime:
     # Is the datetime timezone "aware"?
     if not dt.tzinfo or dt.tzinfo.utcoffset(dt) is None:
         # No, datetime is "naive"
-        dt = DEFAULT_TZ.localize(dt)
+        dt = dt.replace(tzinfo=DEFAULT_TZ)
     return dt
 
 
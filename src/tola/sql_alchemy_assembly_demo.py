@@ -2,9 +2,18 @@
 
 import sys
 
-from sqlalchemy import Column, ForeignKey, Integer, String, create_engine
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Identity,
+    Integer,
+    String,
+    create_engine,
+    event,
+)
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 Base = declarative_base()
 
@@ -12,7 +21,7 @@ Base = declarative_base()
 class Assembly(Base):
     __tablename__ = "assembly"
 
-    assembly_id = Column(Integer, primary_key=True)
+    assembly_id = Column(Integer, Identity(always=False), primary_key=True)
     software_version_id = Column(Integer)
     dataset_id = Column(Integer)
     component_type_id = Column(String)
@@ -24,7 +33,7 @@ class Assembly(Base):
     # with this instance's assembly_id
     source_assembly_assn = relationship(
         "AssemblySource",
-        primaryjoin="Assembly.assembly_id == AssemblySource.assembly_id",
+        primaryjoin=lambda: Assembly.assembly_id == AssemblySource.assembly_id,
         back_populates="component",
     )
     sources = association_proxy("source_assembly_assn", "source")
@@ -32,7 +41,7 @@ class Assembly(Base):
     # Components are assemblies which have this assembly as their source
     component_assembly_assn = relationship(
         "AssemblySource",
-        primaryjoin="Assembly.assembly_id == AssemblySource.source_assembly_id",
+        primaryjoin=lambda: Assembly.assembly_id == AssemblySource.source_assembly_id,
         back_populates="source",
     )
     components = association_proxy("component_assembly_assn", "component")
@@ -61,7 +70,7 @@ class AssemblySource(Base):
 def main():
     # inheritance(Assembly)
     test_creation_of_all_classes()
-    engine = create_engine("sqlite:///assembly.sqlite", echo=False)
+    engine = sqlite_memory_engine()
     Base.metadata.create_all(engine)
     Session = sessionmaker(bind=engine)
     ssn = Session()
@@ -82,6 +91,29 @@ def main():
         print("Source: ", src.name, src.component_type_id, src.description)
 
 
+def sqlite_memory_engine():
+    """
+    In-memory SQLite engine shared by all sessions in this process. The
+    database is thrown away on exit, so skip syncing and journal writes.
+    """
+    engine = create_engine(
+        "sqlite://",
+        echo=False,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def fast_sqlite_pragmas(dbapi_conn, _):
+        crsr = dbapi_conn.cursor()
+        crsr.execute("PRAGMA synchronous=OFF")
+        crsr.execute("PRAGMA journal_mode=MEMORY")
+        crsr.execute("PRAGMA temp_store=MEMORY")
+        crsr.close()
+
+    return engine
+
+
 def assembly_factory(ssn):
     fields = "assembly_id", "name", "component_type_id", "description"
     data = [
@@ -0,0 +1,58 @@
+import json
+
+from click.testing import CliRunner
+
+from tola.compare_pacbio_json import cli, format_rows
+
+
+def test_format_rows():
+    # Empty cells for None are as wide as "None"
+    a = {"idx": "m1", "reads": 12, "species": None}
+    b = {"idx": "m1", "reads": None, "species": None}
+    assert format_rows(a, b).splitlines() == [
+        "      idx  m1    m1  ",
+        "    reads  12        ",
+        "  species            ",
+    ]
+
+
+def write_json(path, rows):
+    path.write_text(json.dumps(rows))
+    return str(path)
+
+
+def test_diff_and_all_fields(tmp_path):
+    row = {
+        "movie": "m1",
+        "tag_index": 1,
+        "specimen": "ilVulVul1",
+        "n": 5,
+        "species": "Vulpes vulpes",
+    }
+    args = [
+        "--compare",
+        write_json(tmp_path / "data.json", [row]),
+        write_json(tmp_path / "report.json", [{**row, "n": 6}]),
+    ]
+    runner = CliRunner()
+
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 0
+    assert result.output == (
+        "Diff for index 'm1#1':\n  source  json  rprt\n   reads  5     6   \n\n"
+    )
+
+    # Every field of both rows is shown with --all-fields
+    result = runner.invoke(cli, [*args, "--all-fields"])
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert len(lines) == 1 + 29 + 1
+    assert lines[:5] == [
+        "Diff for index 'm1#1':",
+        "                idx  m1#1           m1#1         ",
+        "             source  json           rprt         ",
+        "         movie_name  m1             m1           ",
+        "          tag_index  1              1            ",
+    ]
+    assert lines[21] == "              reads  5              6            "
+    assert lines[25] == "            species  Vulpes vulpes  Vulpes vulpes"
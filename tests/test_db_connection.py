@@ -0,0 +1,51 @@
+import json
+import os
+
+import pytest
+
+from tola.db_connection import (
+    ConnectionParamsError,
+    get_connection_params_entry,
+    reset_params_cache,
+)
+
+
+@pytest.fixture
+def params_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    reset_params_cache()
+    yield tmp_path / ".connection_params.json"
+    reset_params_cache()
+
+
+def write_params(path, params, mtime_ns):
+    path.write_text(json.dumps(params))
+    path.chmod(0o600)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_params_cache(params_file):
+    write_params(params_file, {"mlwh": {"host": "one"}}, 1_000_000_000)
+    entry = get_connection_params_entry("mlwh")
+    assert entry == {"host": "one"}
+
+    # Callers get a copy, which they can modify
+    entry["host"] = "changed"
+    assert get_connection_params_entry("mlwh") == {"host": "one"}
+
+    # An edit which leaves the modification time unchanged is not seen...
+    write_params(params_file, {"mlwh": {"host": "two"}}, 1_000_000_000)
+    assert get_connection_params_entry("mlwh") == {"host": "one"}
+
+    # ...until the cache is reset
+    reset_params_cache()
+    assert get_connection_params_entry("mlwh") == {"host": "two"}
+
+    # A new modification time causes the file to be parsed again
+    write_params(params_file, {"mlwh": {"host": "three"}}, 2_000_000_000)
+    assert get_connection_params_entry("mlwh") == {"host": "three"}
+
+    # Permissions are checked even when the contents are cached
+    params_file.chmod(0o644)
+    with pytest.raises(ConnectionParamsError, match="must be mode 0600"):
+        get_connection_params_entry("mlwh")
@@ -0,0 +1,176 @@
+import json
+
+import pytest
+
+from tola.diff_mlwh.column_definitions import get_table_patcher
+from tola.diff_mlwh.database import MLWHDiffDB
+
+
+def write_ndjson(path, rows):
+    with path.open("w") as fh:
+        for row in rows:
+            fh.write(json.dumps(row) + "\n")
+    return str(path)
+
+
+def seq_rows():
+    return [
+        {
+            "data_id": "run1#1",
+            "study_id": 5901,
+            "sample_name": "DTOL001",
+            "scientific_name": "Vulpes vulpes",
+            "taxon_id": 9627,
+            "lims_qc": "pass",
+        },
+        {
+            "data_id": "run1#2",
+            "study_id": 5901,
+            "sample_name": "DTOL002",
+            "scientific_name": "Meles meles",
+            "taxon_id": 9662,
+            "lims_qc": "pass",
+        },
+        {
+            "data_id": "run1#3",
+            "study_id": 5901,
+            "sample_name": "DTOL003",
+            "scientific_name": "Lutra lutra",
+            "taxon_id": 9657,
+            "lims_qc": None,
+        },
+    ]
+
+
+@pytest.fixture
+def diff_db(tmp_path, monkeypatch):
+    # Only local files are read, so avoid needing DuckDB's httpfs extension
+    monkeypatch.delenv("REQUESTS_CA_BUNDLE", raising=False)
+
+    mlwh = seq_rows()
+    tolqc = seq_rows()
+
+    # Two differences in one row and one in another
+    tolqc[0]["scientific_name"] = "Vulpes"
+    tolqc[0]["taxon_id"] = 9625
+    mlwh[2]["lims_qc"] = "fail"
+
+    # Not yet loaded into ToLQC, which is not a difference
+    mlwh.append({"data_id": "run1#4", "study_id": 5901, "sample_name": "DTOL004"})
+
+    db = MLWHDiffDB(tmp_path / "diff_mlwh.duckdb")
+    db.update(
+        None,
+        write_ndjson(tmp_path / "mlwh.ndjson", mlwh),
+        write_ndjson(tmp_path / "tolqc.ndjson", tolqc),
+    )
+
+    return db
+
+
+def test_find_diffs(diff_db):
+    diffs = diff_db.fetch_stored_diffs()
+    assert [(m.data_id, m.differing_columns) for m in diffs] == [
+        ("run1#1", ["scientific_name", "taxon_id"]),
+        ("run1#3", ["lims_qc"]),
+    ]
+    assert diffs[1].mlwh["lims_qc"] == "fail"
+    assert diffs[1].tolqc["lims_qc"] is None
+
+
+def test_fetch_stored_diffs_filters(diff_db):
+    diff_db.load_reason_dict_entry(("qc", "LIMS QC not yet synced"))
+    diff_db.store_reasons("qc", ["run1#3"])
+
+    def fetched_ids(**kwargs):
+        return [m.data_id for m in diff_db.fetch_stored_diffs(**kwargs)]
+
+    assert fetched_ids(show_new_diffs=True) == ["run1#1", "run1#3"]
+    assert fetched_ids(since="2000-01-01", reason="qc") == ["run1#3"]
+    assert fetched_ids(reason="NONE") == ["run1#1"]
+    assert fetched_ids(column_class=["lims_qc"], reason="NONE") == []
+    assert fetched_ids(
+        column_class=["lims_qc"], reason="qc", data_id_list=["run1#1", "run1#3"]
+    ) == ["run1#3"]
+    assert fetched_ids(since="2999-01-01") == []
+
+
+def test_data_table_patcher(diff_db):
+    patcher = get_table_patcher("data")
+    assert patcher(diff_db.fetch_stored_diffs()) == [
+        {"data.id": "run1#3", "lims_qc": "fail"},
+    ]
+
+
+def test_known_diffs_not_stored_again(diff_db, tmp_path):
+    diff_db.conn.close()
+    db = MLWHDiffDB(tmp_path / "diff_mlwh.duckdb")
+    db.find_diffs()
+    assert len(db.fetch_stored_diffs()) == 2
+
+
+def build_hash_diff_store(db, found_at):
+    """
+    Rebuild the `diff_store` in the format which held DuckDB `hash()` values,
+    with a stale row for "run1#3" which no longer matches the `mlwh` table.
+    """
+    db.execute("DROP TABLE diff_store")
+    db.execute("""
+      CREATE TABLE diff_store(
+          data_id VARCHAR PRIMARY KEY
+          , mlwh_hash UBIGINT
+          , tolqc_hash UBIGINT
+          , differing_columns VARCHAR[]
+          , found_at TIMESTAMP WITH TIME ZONE
+      )
+    """)
+    db.execute(
+        """
+        INSERT INTO diff_store
+        SELECT data_id
+          , IF(data_id = 'run1#3', 0, hash(mlwh))
+          , hash(tolqc)
+          , ['some_column']
+          , ?::TIMESTAMPTZ
+        FROM mlwh JOIN tolqc USING (data_id)
+        WHERE data_id IN ('run1#1', 'run1#3')
+        """,
+        (found_at,),
+    )
+
+
+def test_convert_hash_diff_store(diff_db, tmp_path):
+    found_at = "2024-01-02 03:04:05+00"
+    build_hash_diff_store(diff_db, found_at)
+    diff_db.conn.close()
+
+    db = MLWHDiffDB(tmp_path / "diff_mlwh.duckdb")
+    assert db.diff_store_hash_type() == "VARCHAR"
+    (stored,) = db.fetch_stored_diffs()
+    assert stored.data_id == "run1#1"
+    assert stored.differing_columns == ["some_column"]
+    sql = "SELECT found_at = ?::TIMESTAMPTZ FROM diff_store WHERE data_id = 'run1#1'"
+    assert db.execute(sql, (found_at,)).fetchone() == (True,)
+
+    # The stale diff is found again, but the converted one is kept as it is
+    db.find_diffs()
+    assert [(m.data_id, m.differing_columns) for m in db.fetch_stored_diffs()] == [
+        ("run1#1", ["some_column"]),
+        ("run1#3", ["lims_qc"]),
+    ]
+
+
+def test_convert_hash_diff_store_rollback(diff_db, monkeypatch):
+    build_hash_diff_store(diff_db, "2024-01-02 03:04:05+00")
+
+    def fail():
+        msg = "Failed to create diff_store"
+        raise RuntimeError(msg)
+
+    monkeypatch.setattr(diff_db, "create_diff_store", fail)
+    with pytest.raises(RuntimeError, match="Failed to create"):
+        diff_db.convert_diff_store_to_md5_hashes()
+
+    # The rename was rolled back, and the connection is still usable
+    assert diff_db.existing_tables({"diff_store", "diff_store_hash"}) == {"diff_store"}
+    assert diff_db.diff_store_hash_type() == "UBIGINT"